@@ -4,14 +4,26 @@ Importarr - Unified Stash & File Import Script for Whisparr
 Supports both Stash scene sync and file import operations.
 """
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import json
+import logging
+import logging.handlers
+import queue
 import os
-from typing import List, Dict, Optional
+import codecs
+import itertools
+from collections import deque
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import AbstractSet, List, Dict, Optional, Iterable, Iterator, Tuple
 import sys
+import atexit
 from datetime import datetime
-import schedule
 
 # ============== CONFIGURATION FROM ENV ==============
 # General Settings
@@ -19,6 +31,7 @@ MODE = os.environ.get("IMPORTARR_MODE", "both")  # both, stash, files
 RUN_MODE = os.environ.get("IMPORTARR_RUN_MODE", "once")  # once, interval
 RUN_INTERVAL_HOURS = int(os.environ.get("IMPORTARR_INTERVAL_HOURS", "24"))
 DRY_RUN = os.environ.get("IMPORTARR_DRY_RUN", "false").lower() == "true"
+LOG_LEVEL = os.environ.get("IMPORTARR_LOG_LEVEL", "INFO").upper()  # DEBUG adds per-scene details
 
 # Whisparr Settings
 WHISPARR_URL = os.environ.get("WHISPARR_URL", "http://whisparr:9090")
@@ -29,7 +42,8 @@ STASH_URL = os.environ.get("STASH_URL", "http://stash:9999")
 STASH_API_KEY = os.environ.get("STASH_API_KEY", "")
 STASH_BATCH_SIZE = int(os.environ.get("STASH_BATCH_SIZE", "50"))
 STASH_DELAY_BETWEEN_BATCHES = int(os.environ.get("STASH_DELAY_BETWEEN_BATCHES", "5"))
-STASH_DELAY_BETWEEN_REQUESTS = float(os.environ.get("STASH_DELAY_BETWEEN_REQUESTS", "0.5"))
+STASH_DELAY_BETWEEN_REQUESTS = float(os.environ.get("STASH_DELAY_BETWEEN_REQUESTS", "0"))  # 0 relies on Retry-After pacing
+STASH_MAX_CONCURRENT_REQUESTS = int(os.environ.get("STASH_MAX_CONCURRENT_REQUESTS", "10"))
 
 # File Import Settings (for file import mode)
 IMPORT_FOLDER = os.environ.get("IMPORT_FOLDER", "/import")
@@ -41,6 +55,7 @@ PROCESS_ROOT_FILES = os.environ.get("PROCESS_ROOT_FILES", "false").lower() == "t
 MAX_SUBFOLDERS = os.environ.get("MAX_SUBFOLDERS", None)
 MAX_SUBFOLDERS = int(MAX_SUBFOLDERS) if MAX_SUBFOLDERS else None
 MAX_DEPTH = int(os.environ.get("MAX_DEPTH", "10"))
+FILE_SCAN_WORKERS = int(os.environ.get("FILE_SCAN_WORKERS", "8"))
 
 # Whisparr Scene Add Settings
 QUALITY_PROFILE_ID = int(os.environ.get("WHISPARR_QUALITY_PROFILE_ID", "1"))
@@ -48,19 +63,92 @@ ROOT_FOLDER_PATH = os.environ.get("WHISPARR_ROOT_FOLDER_PATH", "")
 TAG_IDS_STR = os.environ.get("WHISPARR_TAG_IDS", "")
 TAG_IDS = [int(t.strip()) for t in TAG_IDS_STR.split(",") if t.strip()] if TAG_IDS_STR else []
 
+# Existing Scene Cache Settings
+ID_CACHE_FILE = os.environ.get("WHISPARR_ID_CACHE_FILE", "/config/whisparr_ids.json")
+ID_CACHE_HOURS = float(os.environ.get("WHISPARR_ID_CACHE_HOURS", "168"))  # 0 disables the cache
+
 # ====================================================
 
-whisparr_headers = {"X-Api-Key": WHISPARR_API_KEY}
+log = logging.getLogger("importarr")
+
+
+def decode_json(response: requests.Response):
+    """Decode a response body with orjson, raising the same error type as response.json()."""
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so writes to stdout happen on a background thread."""
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    
+    log.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.propagate = False
+    
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+whisparr_headers = {
+    "X-Api-Key": WHISPARR_API_KEY,
+    "Content-Type": "application/json"
+}
 stash_headers = {
     "ApiKey": STASH_API_KEY,
     "Content-Type": "application/json"
 }
 
+
+class PostSafeRetry(Retry):
+    """Retry policy that only re-sends a POST when the server reports it was not processed."""
+    POST_RETRY_STATUSES = frozenset({429, 503})
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        # Gateway errors may arrive after Whisparr acted on a POST; only a 429/503
+        # with Retry-After signals it was not processed and is safe to resend
+        if method == "POST":
+            return has_retry_after and status_code in self.POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_session(headers: Dict, pool_size: int) -> requests.Session:
+    """Create a session with a keep-alive connection pool and transient-error retries."""
+    session = requests.Session()
+    session.headers.update(headers)
+    retry = PostSafeRetry(
+        total=5,
+        read=False,  # a slow endpoint raises Timeout instead of being re-requested
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# One pooled session per host, sized to the number of concurrent workers
+whisparr_session = create_session(whisparr_headers, max(STASH_MAX_CONCURRENT_REQUESTS, FILE_SCAN_WORKERS))
+stash_session = create_session(stash_headers, 1)
+
 # Global stats
 total_stats = {
     "stash": {
         "scenes_found": 0,
         "scenes_with_stashdb": 0,
+        "scenes_duplicate": 0,
         "scenes_added": 0,
         "scenes_already_exist": 0,
         "scenes_failed": 0,
@@ -73,37 +161,148 @@ total_stats = {
         "batches_processed": 0
     }
 }
+stats_lock = threading.Lock()
+
+# Substrings of a Whisparr 400 error message meaning the scene is already added
+EXISTS_MARKERS = ("already", "exist")
+
+# Cleared when Whisparr does not expose the bulk movie import endpoint
+bulk_import_supported = True
+
+# Returned by add_scenes_bulk when Whisparr may or may not have added the scenes
+BULK_OUTCOME_UNKNOWN = object()
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces request starts at least `interval` seconds apart."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+whisparr_add_limiter = RateLimiter(STASH_DELAY_BETWEEN_REQUESTS)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of up to `size` items, consuming the iterable lazily."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_json_array(response: requests.Response, chunk_size: int = 65536) -> Iterator:
+    """Decode a streamed top-level JSON array one element at a time."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = response.iter_content(chunk_size=chunk_size)
+    buffer = ""
+    state = "start"  # start -> open (after "[") -> element/separator alternate
+    exhausted = False
+    
+    while True:
+        buffer = buffer.lstrip()
+        
+        if buffer:
+            char = buffer[0]
+            if state == "start":
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                state = "open"
+                buffer = buffer[1:]
+                continue
+            if state == "separator":
+                if char == "]":
+                    return
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+                state = "element"
+                buffer = buffer[1:]
+                continue
+            if char == "]" and state == "open":
+                return
+            if char in ",]":
+                raise ValueError(f"Expected a JSON array element, got {char!r}")
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if exhausted:
+                    raise
+            else:
+                # A value cut off by the chunk boundary can still decode (e.g.
+                # "12" of "1234" or "1" of "1.5"), so only yield it once the
+                # following separator has arrived
+                rest = buffer[end:].lstrip()
+                if exhausted or (rest and rest[0] in ",]"):
+                    yield item
+                    state = "separator"
+                    buffer = buffer[end:]
+                    continue
+        elif exhausted:
+            raise ValueError("Truncated JSON array")
+        
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
 
 
 # ============== STASH SYNC FUNCTIONS ==============
 
+@dataclass(slots=True)
+class StashScene:
+    """A Stash scene with a StashDB ID, reduced to the fields used for syncing."""
+    stash_id: str
+    title: str
+    date: Optional[str]
+    studio: Optional[str]
+    performers: Tuple[str, ...]
+    endpoint: str
+
+
 def get_root_folders() -> List[Dict]:
     """Get available root folders from Whisparr."""
     try:
-        response = requests.get(
+        response = whisparr_session.get(
             f"{WHISPARR_URL}/api/v3/rootfolder",
-            headers=whisparr_headers,
             timeout=10
         )
         response.raise_for_status()
-        return response.json()
+        return decode_json(response)
     except requests.exceptions.RequestException as e:
-        print(f"WARNING: Failed to get root folders: {e}")
+        log.warning(f"WARNING: Failed to get root folders: {e}")
         return []
 
 
-def get_stash_scenes() -> List[Dict]:
-    """Fetch all scenes from Stash using GraphQL with detailed metadata."""
-    print("Fetching scenes from Stash...")
+def iter_stash_scenes() -> Iterator[Dict]:
+    """Stream all scenes from Stash using GraphQL, one page at a time."""
+    log.info("Fetching scenes from Stash...")
     
-    all_scenes = []
-    page = 1
+    fetched = 0
+    last_id = 0  # Page on id > last_id so Stash never skips over earlier rows
     per_page = 100
     
+    # Performers are only shown in debug output, so skip them otherwise
+    performers_field = "performers { name }" if log.isEnabledFor(logging.DEBUG) else ""
     query = """
-    query FindScenes($filter: FindFilterType!) {
-        findScenes(filter: $filter) {
-            count
+    query FindScenes($filter: FindFilterType!, $scene_filter: SceneFilterType) {
+        findScenes(filter: $filter, scene_filter: $scene_filter) {
             scenes {
                 id
                 title
@@ -115,146 +314,271 @@ def get_stash_scenes() -> List[Dict]:
                     endpoint
                     stash_id
                 }
-                performers {
-                    name
-                }
-                files {
-                    path
-                }
+                %s
             }
         }
     }
-    """
+    """ % performers_field
     
     while True:
         variables = {
             "filter": {
-                "page": page,
                 "per_page": per_page,
                 "sort": "id",
                 "direction": "ASC"
+            },
+            "scene_filter": {
+                "id": {
+                    "value": last_id,
+                    "modifier": "GREATER_THAN"
+                }
             }
         }
         
         try:
-            response = requests.post(
+            response = stash_session.post(
                 f"{STASH_URL}/graphql",
-                headers=stash_headers,
-                json={"query": query, "variables": variables},
+                data=orjson.dumps({"query": query, "variables": variables}),
                 timeout=30
             )
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response)
             
             if "errors" in data:
-                print(f"ERROR: GraphQL errors: {data['errors']}")
+                log.error(f"ERROR: GraphQL errors: {data['errors']}")
                 break
             
             scenes = data.get("data", {}).get("findScenes", {}).get("scenes", [])
-            total_count = data.get("data", {}).get("findScenes", {}).get("count", 0)
             
             if not scenes:
                 break
             
-            all_scenes.extend(scenes)
-            print(f"  Fetched {len(all_scenes)}/{total_count} scenes...")
+            fetched += len(scenes)
+            total_stats["stash"]["scenes_found"] += len(scenes)
+            log.info(f"  Fetched {fetched} scenes...")
+            
+            yield from scenes
             
-            if len(all_scenes) >= total_count:
+            if len(scenes) < per_page:
                 break
             
-            page += 1
+            last_id = int(scenes[-1]["id"])
             
         except requests.exceptions.RequestException as e:
-            print(f"ERROR: Failed to fetch scenes from Stash: {e}")
+            log.error(f"ERROR: Failed to fetch scenes from Stash: {e}")
             break
     
-    print(f"✓ Found {len(all_scenes)} total scenes in Stash")
-    return all_scenes
+    log.info(f"✓ Found {fetched} total scenes in Stash")
 
 
-def filter_stashdb_scenes(scenes: List[Dict]) -> List[Dict]:
+def iter_stashdb_scenes(scenes: Iterable[Dict]) -> Iterator[StashScene]:
     """Filter scenes to only those with StashDB IDs and extract metadata."""
-    stashdb_scenes = []
+    # Yield each StashDB ID once so duplicate Stash scenes cost no extra Whisparr request
+    seen_stash_ids = set()
     
     for scene in scenes:
-        stash_ids = scene.get("stash_ids", [])
+        stash_id = next(
+            (s for s in scene.get("stash_ids", []) if "stashdb.org" in s.get("endpoint", "")),
+            None
+        )
+        if not stash_id:
+            continue
         
-        for stash_id in stash_ids:
-            endpoint = stash_id.get("endpoint", "")
-            if "stashdb.org" in endpoint:
-                studio = scene.get("studio")
-                studio_name = studio.get("name") if studio else None
-                
-                performers = scene.get("performers", [])
-                performer_names = [p.get("name") for p in performers if p.get("name")]
-                
-                stashdb_scenes.append({
-                    "stash_id": stash_id.get("stash_id"),
-                    "title": scene.get("title", "Unknown"),
-                    "date": scene.get("date"),
-                    "studio": studio_name,
-                    "performers": performer_names,
-                    "endpoint": endpoint,
-                    "files": scene.get("files", [])
-                })
-                break
+        total_stats["stash"]["scenes_with_stashdb"] += 1
+        if stash_id.get("stash_id") in seen_stash_ids:
+            log.debug("  Duplicate StashDB ID (skipping): %s", stash_id.get("stash_id"))
+            total_stats["stash"]["scenes_duplicate"] += 1
+            continue
+        seen_stash_ids.add(stash_id.get("stash_id"))
+        
+        studio = scene.get("studio")
+        performers = scene.get("performers") or []
+        
+        yield StashScene(
+            stash_id=stash_id.get("stash_id"),
+            title=scene.get("title", "Unknown"),
+            date=scene.get("date"),
+            studio=studio.get("name") if studio else None,
+            performers=tuple(p["name"] for p in performers if p.get("name")),
+            endpoint=stash_id["endpoint"]
+        )
+
+
+def iter_whisparr_movies() -> Iterator[Dict]:
+    """Stream all movies/scenes currently in Whisparr."""
+    # The movie endpoint is not paginated, so decode the array as it arrives
+    with whisparr_session.get(
+        f"{WHISPARR_URL}/api/v3/movie",
+        stream=True,
+        timeout=180
+    ) as response:
+        response.raise_for_status()
+        yield from iter_json_array(response)
+
+
+def load_stash_id_cache() -> Optional[Tuple[AbstractSet[str], float]]:
+    """Load cached Whisparr StashDB IDs and their fetch time if the cache is enabled and still fresh."""
+    if ID_CACHE_HOURS <= 0:
+        return None
+    
+    try:
+        with open(ID_CACHE_FILE, "rb") as f:
+            cache = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning(f"WARNING: Ignoring unreadable ID cache {ID_CACHE_FILE}: {e}")
+        return None
+    
+    fetched_at = cache.get("ts", 0)
+    if (time.time() - fetched_at) / 3600 >= ID_CACHE_HOURS:
+        return None
     
-    return stashdb_scenes
+    return frozenset(cache.get("ids", [])), fetched_at
 
 
-def get_whisparr_movies() -> List[Dict]:
-    """Get all movies/scenes currently in Whisparr."""
+def save_stash_id_cache(stash_ids: Iterable[str], timestamp: float):
+    """Persist Whisparr StashDB IDs along with the time they were fetched."""
+    if ID_CACHE_HOURS <= 0 or DRY_RUN:
+        return
+    
     try:
-        response = requests.get(
-            f"{WHISPARR_URL}/api/v3/movie",
-            headers=whisparr_headers,
-            timeout=180
-        )
-        response.raise_for_status()
-        return response.json()
+        cache_dir = os.path.dirname(ID_CACHE_FILE)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{ID_CACHE_FILE}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps({"ts": timestamp, "ids": list(stash_ids)}))
+        os.replace(tmp_file, ID_CACHE_FILE)
+    except OSError as e:
+        log.warning(f"WARNING: Failed to write ID cache {ID_CACHE_FILE}: {e}")
+
+
+def get_existing_stash_ids() -> Tuple[AbstractSet[str], Optional[float]]:
+    """Get StashDB IDs already in Whisparr (cached or fetched) and their fetch time, or None if incomplete."""
+    cache = load_stash_id_cache()
+    if cache is not None:
+        cached_ids, cached_at = cache
+        log.info(f"✓ Loaded {len(cached_ids)} existing StashDB IDs from cache ({ID_CACHE_FILE})\n")
+        return cached_ids, cached_at
+    
+    log.info("Fetching existing scenes from Whisparr...")
+    fetched_at = time.time()
+    existing_count = 0
+    stash_ids = set()
+    
+    try:
+        for movie in iter_whisparr_movies():
+            existing_count += 1
+            if movie.get("stashId"):
+                stash_ids.add(movie["stashId"])
     except requests.exceptions.Timeout:
-        print(f"WARNING: Timeout fetching existing movies (large library)")
-        print(f"  Continuing without duplicate check - may see 'already exists' errors")
-        return []
+        log.warning(f"WARNING: Timeout fetching existing movies (large library)")
+        log.info(f"  Continuing with partial duplicate check ({len(stash_ids)} IDs) - may see 'already exists' errors")
+        return stash_ids, None
     except requests.exceptions.RequestException as e:
-        print(f"WARNING: Failed to get existing Whisparr movies: {e}")
-        return []
+        log.warning(f"WARNING: Failed to get existing Whisparr movies: {e}")
+        log.info(f"  Continuing with partial duplicate check ({len(stash_ids)} IDs)")
+        return stash_ids, None
+    except ValueError as e:
+        log.warning(f"WARNING: Invalid response fetching existing Whisparr movies: {e}")
+        log.info(f"  Continuing with partial duplicate check ({len(stash_ids)} IDs)")
+        return stash_ids, None
+    
+    log.info(f"✓ Found {existing_count} existing scenes in Whisparr")
+    log.info(f"  ({len(stash_ids)} have StashDB IDs)\n")
+    
+    save_stash_id_cache(stash_ids, fetched_at)
+    return stash_ids, fetched_at
+
+
+def build_add_data(stash_id: str, title: str, root_folder: str) -> Dict:
+    """Build the Whisparr movie resource used to add a scene by StashDB ID."""
+    add_data = {
+        "title": title,
+        "foreignId": stash_id,
+        "stashId": stash_id,
+        "qualityProfileId": QUALITY_PROFILE_ID,
+        "monitored": True,
+        "rootFolderPath": root_folder,
+        "addOptions": {
+            "searchForMovie": False,
+            "monitor": "movieOnly"
+        }
+    }
+    
+    if TAG_IDS:
+        add_data["tags"] = TAG_IDS
+    
+    return add_data
+
+
+def add_scenes_bulk(scenes: List[StashScene], root_folder: str):
+    """Bulk add scenes; returns the added StashDB IDs, None to add individually, or BULK_OUTCOME_UNKNOWN."""
+    global bulk_import_supported
+    
+    whisparr_add_limiter.wait()
+    
+    try:
+        response = whisparr_session.post(
+            f"{WHISPARR_URL}/api/v3/movie/import",
+            data=orjson.dumps([build_add_data(scene.stash_id, scene.title, root_folder) for scene in scenes]),
+            # Whisparr looks up every scene's metadata before responding
+            timeout=30 + 5 * len(scenes)
+        )
+        if response.status_code in (404, 405):
+            log.info(f"  Bulk import endpoint not available, adding scenes individually")
+            bulk_import_supported = False
+            return None
+        if 400 <= response.status_code < 500:
+            log.warning(f"  WARNING: Bulk add rejected (HTTP {response.status_code}), adding scenes individually")
+            return None
+        response.raise_for_status()
+        
+        added_ids = set()
+        for movie in decode_json(response):
+            stash_id = movie.get("stashId") or movie.get("foreignId")
+            if stash_id:
+                added_ids.add(stash_id)
+        return added_ids
+        
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Whisparr may still be adding these; retrying now could queue them twice
+        log.warning(f"  WARNING: Bulk add outcome unknown, leaving scenes for the next run: {e}")
+        return BULK_OUTCOME_UNKNOWN
+
+
+def get_error_messages(error_data) -> List[str]:
+    """Extract the lowercased messages from a Whisparr error response body."""
+    # Validation failures are a list of {propertyName, errorMessage, ...}
+    if isinstance(error_data, list):
+        return [str(d.get("errorMessage", "")).lower() for d in error_data if isinstance(d, dict)]
+    if isinstance(error_data, dict):
+        return [str(error_data.get("message", "")).lower()]
+    return [str(error_data).lower()]
 
 
 def add_scene_to_whisparr(stash_id: str, title: str, root_folder: str) -> bool:
-    """Add a scene to Whisparr directly using StashDB ID."""
+    """Add a scene to Whisparr directly using StashDB ID (thread-safe, rate limited)."""
     if DRY_RUN:
-        print(f"    [DRY RUN] Would add scene")
+        log.info(f"    [DRY RUN] Would add scene: {title}")
         return True
     
+    whisparr_add_limiter.wait()
+    
     try:
-        add_data = {
-            "title": title,
-            "foreignId": stash_id,
-            "stashId": stash_id,
-            "qualityProfileId": QUALITY_PROFILE_ID,
-            "monitored": True,
-            "rootFolderPath": root_folder,
-            "addOptions": {
-                "searchForMovie": False,
-                "monitor": "movieOnly"
-            }
-        }
+        add_data = build_add_data(stash_id, title, root_folder)
         
-        if TAG_IDS:
-            add_data["tags"] = TAG_IDS
-        
-        add_response = requests.post(
+        add_response = whisparr_session.post(
             f"{WHISPARR_URL}/api/v3/movie",
-            headers=whisparr_headers,
-            json=add_data,
+            data=orjson.dumps(add_data),
             timeout=30
         )
         add_response.raise_for_status()
         
-        response_data = add_response.json()
+        response_data = decode_json(add_response)
         actual_title = response_data.get("title", title)
-        print(f"    ✓ Added: {actual_title}")
+        log.info(f"    ✓ Added: {actual_title}")
         return True
         
     except requests.exceptions.HTTPError as e:
@@ -262,229 +586,248 @@ def add_scene_to_whisparr(stash_id: str, title: str, root_folder: str) -> bool:
             status_code = e.response.status_code
             
             try:
-                error_data = e.response.json()
-                error_msg = str(error_data).lower()
+                error_data = decode_json(e.response)
+                messages = get_error_messages(error_data)
                 
-                if status_code == 400 and ("already" in error_msg or "exist" in error_msg):
-                    print(f"    Already exists in Whisparr")
-                    total_stats["stash"]["scenes_already_exist"] += 1
+                if status_code == 400 and any(marker in m for m in messages for marker in EXISTS_MARKERS):
+                    log.info(f"    Already exists in Whisparr: {title}")
+                    with stats_lock:
+                        total_stats["stash"]["scenes_already_exist"] += 1
                     return True
                 
-                if status_code == 404 or "not found" in error_msg:
-                    print(f"    ⚠ Scene not found in StashDB metadata provider")
+                if status_code == 404 or any("not found" in m for m in messages):
+                    log.warning(f"    ⚠ Scene not found in StashDB metadata provider: {title}")
                     return False
                 
-                if "validation" in error_msg:
-                    print(f"    ERROR: Validation failed - {error_data}")
+                # A list body is Whisparr's validation failure response
+                if isinstance(error_data, list):
+                    details = "; ".join(
+                        str(d.get("errorMessage", d)) if isinstance(d, dict) else str(d)
+                        for d in error_data
+                    )
+                    log.error(f"    ERROR: Validation failed for {title} - {details}")
                     return False
                 
-            except:
+            except ValueError:
                 pass
             
-            print(f"    ERROR: HTTP {status_code}")
+            log.error(f"    ERROR: HTTP {status_code} adding {title}")
         else:
-            print(f"    ERROR: Failed to add scene: {e}")
+            log.error(f"    ERROR: Failed to add scene {title}: {e}")
         
         return False
         
     except requests.exceptions.RequestException as e:
-        print(f"    ERROR: Network error: {e}")
+        log.error(f"    ERROR: Network error adding {title}: {e}")
         return False
 
 
-def process_stash_batch(batch: List[Dict], batch_num: int, total_batches: int, 
-                        existing_stash_ids: set, root_folder: str) -> Dict:
+def process_stash_batch(batch: List[StashScene], batch_num: int,
+                        existing_stash_ids: AbstractSet[str], added_stash_ids: set, root_folder: str) -> Dict:
     """Process a batch of Stash scenes."""
     status = "[DRY RUN]" if DRY_RUN else ""
-    print(f"\n[Batch {batch_num}/{total_batches}] Processing {len(batch)} scenes {status}")
-    print("-" * 60)
+    log.info(f"\n[Batch {batch_num}] Processing {len(batch)} scenes {status}")
+    log.info("-" * 60)
     
     added = 0
     failed = 0
+    to_add = []
+    debug = log.isEnabledFor(logging.DEBUG)
     
     for scene in batch:
-        stash_id = scene["stash_id"]
-        title = scene["title"]
-        studio = scene.get("studio")
-        date = scene.get("date")
+        stash_id = scene.stash_id
+        title = scene.title
+        studio = scene.studio
+        date = scene.date
         
-        print(f"  {title[:70]}{'...' if len(title) > 70 else ''}")
-        if studio:
-            print(f"    Studio: {studio}")
-        if date:
-            print(f"    Date: {date}")
-        print(f"    StashDB ID: {stash_id}")
+        if debug:
+            log.debug("  %s%s", title[:70], "..." if len(title) > 70 else "")
+            if studio:
+                log.debug("    Studio: %s", studio)
+            if date:
+                log.debug("    Date: %s", date)
+            if scene.performers:
+                log.debug("    Performers: %s", ", ".join(scene.performers))
+            log.debug("    StashDB ID: %s", stash_id)
         
         if stash_id in existing_stash_ids:
-            print(f"    Already exists (skipping)")
+            if debug:
+                log.debug("    Already exists (skipping): %s", title)
             total_stats["stash"]["scenes_already_exist"] += 1
             added += 1
-            if STASH_DELAY_BETWEEN_REQUESTS > 0:
-                time.sleep(STASH_DELAY_BETWEEN_REQUESTS)
             continue
         
-        success = add_scene_to_whisparr(stash_id, title, root_folder)
+        to_add.append(scene)
+    
+    if not to_add:
+        return {"added": added, "failed": failed}
+    
+    if bulk_import_supported and not DRY_RUN:
+        log.info(f"  Adding {len(to_add)} scenes in one bulk request...")
+        bulk_added_ids = add_scenes_bulk(to_add, root_folder)
         
-        if success:
-            added += 1
-            existing_stash_ids.add(stash_id)
-        else:
-            failed += 1
+        if bulk_added_ids is BULK_OUTCOME_UNKNOWN:
+            failed += len(to_add)
+            return {"added": added, "failed": failed}
+        
+        if bulk_added_ids is not None:
+            remaining = []
+            for scene in to_add:
+                if scene.stash_id in bulk_added_ids:
+                    log.info(f"    ✓ Added: {scene.title}")
+                    added += 1
+                    added_stash_ids.add(scene.stash_id)
+                else:
+                    remaining.append(scene)
+            to_add = remaining
         
-        if STASH_DELAY_BETWEEN_REQUESTS > 0:
-            time.sleep(STASH_DELAY_BETWEEN_REQUESTS)
+        if not to_add:
+            return {"added": added, "failed": failed}
+    
+    log.info(f"  Adding {len(to_add)} scenes individually ({STASH_MAX_CONCURRENT_REQUESTS} concurrent requests)...")
+    
+    with ThreadPoolExecutor(max_workers=STASH_MAX_CONCURRENT_REQUESTS) as executor:
+        futures = {
+            executor.submit(add_scene_to_whisparr, scene.stash_id, scene.title, root_folder): scene.stash_id
+            for scene in to_add
+        }
+        
+        for future in as_completed(futures):
+            if future.result():
+                added += 1
+                added_stash_ids.add(futures[future])
+            else:
+                failed += 1
     
     return {"added": added, "failed": failed}
 
 
 def run_stash_sync():
     """Main Stash sync function."""
-    print("\n" + "=" * 60)
-    print("STASH SYNC MODE")
-    print("=" * 60)
-    print(f"Stash URL: {STASH_URL}")
-    print(f"Whisparr URL: {WHISPARR_URL}")
-    print(f"Batch Size: {STASH_BATCH_SIZE}")
-    print(f"Dry Run: {DRY_RUN}")
+    log.info("\n" + "=" * 60)
+    log.info("STASH SYNC MODE")
+    log.info("=" * 60)
+    log.info(f"Stash URL: {STASH_URL}")
+    log.info(f"Whisparr URL: {WHISPARR_URL}")
+    log.info(f"Batch Size: {STASH_BATCH_SIZE}")
+    log.info(f"Dry Run: {DRY_RUN}")
     if TAG_IDS:
-        print(f"Tags to apply: {TAG_IDS}")
-    print("=" * 60)
-    print()
+        log.info(f"Tags to apply: {TAG_IDS}")
+    log.info("=" * 60)
+    log.info("")
     
     if DRY_RUN:
-        print("⚠️ DRY RUN MODE - No scenes will be added to Whisparr\n")
+        log.info("⚠️ DRY RUN MODE - No scenes will be added to Whisparr\n")
     
     # Get root folder
     root_folders = get_root_folders()
     if not root_folders:
-        print("ERROR: No root folders found in Whisparr")
+        log.error("ERROR: No root folders found in Whisparr")
         return False
     
     root_folder = ROOT_FOLDER_PATH if ROOT_FOLDER_PATH else root_folders[0].get("path")
-    print(f"Using root folder: {root_folder}\n")
+    log.info(f"Using root folder: {root_folder}\n")
     
     # Get existing movies
-    print("Fetching existing scenes from Whisparr...")
-    existing_movies = get_whisparr_movies()
-    existing_stash_ids = {
-        m.get("stashId") for m in existing_movies 
-        if m.get("stashId")
-    }
-    print(f"✓ Found {len(existing_movies)} existing scenes in Whisparr")
-    print(f"  ({len(existing_stash_ids)} have StashDB IDs)\n")
-    
-    # Get scenes from Stash
-    all_scenes = get_stash_scenes()
-    total_stats["stash"]["scenes_found"] = len(all_scenes)
+    existing_stash_ids, fetched_at = get_existing_stash_ids()
+    added_stash_ids = set()
     
-    if not all_scenes:
-        print("No scenes found in Stash!")
-        return True
-    
-    # Filter to StashDB scenes
-    print("\nFiltering scenes with StashDB IDs...")
-    stashdb_scenes = filter_stashdb_scenes(all_scenes)
-    total_stats["stash"]["scenes_with_stashdb"] = len(stashdb_scenes)
-    
-    print(f"✓ Found {len(stashdb_scenes)} scenes with StashDB IDs")
-    print(f"  ({len(all_scenes) - len(stashdb_scenes)} scenes without StashDB IDs will be ignored)")
-    print()
-    
-    if not stashdb_scenes:
-        print("No scenes with StashDB IDs found!")
-        return True
+    # Stream StashDB scenes from Stash and process in batches
+    total_stats["stash"]["scenes_found"] = 0
+    total_stats["stash"]["scenes_with_stashdb"] = 0
+    total_stats["stash"]["scenes_duplicate"] = 0
     
-    # Process in batches
-    print(f"Adding scenes to Whisparr...")
-    print(f"NOTE: Whisparr will automatically fetch metadata from StashDB for each scene")
-    print()
+    log.info(f"Adding scenes with StashDB IDs to Whisparr...")
+    log.info(f"NOTE: Whisparr will automatically fetch metadata from StashDB for each scene")
+    log.info("")
     
     start_time = time.time()
-    total_batches = (len(stashdb_scenes) + STASH_BATCH_SIZE - 1) // STASH_BATCH_SIZE
+    stashdb_scenes = iter_stashdb_scenes(iter_stash_scenes())
     
-    for i in range(0, len(stashdb_scenes), STASH_BATCH_SIZE):
-        batch = stashdb_scenes[i:i+STASH_BATCH_SIZE]
-        batch_num = i // STASH_BATCH_SIZE + 1
+    for batch_num, batch in enumerate(batched(stashdb_scenes, STASH_BATCH_SIZE), 1):
+        if batch_num > 1 and STASH_DELAY_BETWEEN_BATCHES > 0:
+            log.info(f"\nWaiting {STASH_DELAY_BETWEEN_BATCHES} seconds before next batch...")
+            time.sleep(STASH_DELAY_BETWEEN_BATCHES)
         
-        stats = process_stash_batch(batch, batch_num, total_batches, existing_stash_ids, root_folder)
+        stats = process_stash_batch(batch, batch_num, existing_stash_ids, added_stash_ids, root_folder)
         
         total_stats["stash"]["scenes_added"] += stats["added"]
         total_stats["stash"]["scenes_failed"] += stats["failed"]
         total_stats["stash"]["batches_processed"] += 1
-        
-        if i + STASH_BATCH_SIZE < len(stashdb_scenes) and STASH_DELAY_BETWEEN_BATCHES > 0:
-            print(f"\nWaiting {STASH_DELAY_BETWEEN_BATCHES} seconds before next batch...")
-            time.sleep(STASH_DELAY_BETWEEN_BATCHES)
+    
+    # Fold newly added scenes into the cached snapshot
+    if fetched_at is not None:
+        save_stash_id_cache(existing_stash_ids | added_stash_ids, fetched_at)
+    
+    if not total_stats["stash"]["scenes_found"]:
+        log.info("No scenes found in Stash!")
+        return True
+    
+    if not total_stats["stash"]["scenes_with_stashdb"]:
+        log.info("No scenes with StashDB IDs found!")
+        return True
     
     # Summary
     elapsed = time.time() - start_time
-    print("\n" + "=" * 60)
-    print("Stash Sync Complete!")
-    print("=" * 60)
-    print(f"Time elapsed: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
-    print(f"Total scenes in Stash: {total_stats['stash']['scenes_found']}")
-    print(f"Scenes with StashDB IDs: {total_stats['stash']['scenes_with_stashdb']}")
-    print(f"Batches processed: {total_stats['stash']['batches_processed']}")
-    print(f"Scenes added to Whisparr: {total_stats['stash']['scenes_added']}")
-    print(f"Scenes already existed: {total_stats['stash']['scenes_already_exist']}")
-    print(f"Scenes failed: {total_stats['stash']['scenes_failed']}")
-    print("=" * 60)
+    log.info("\n" + "=" * 60)
+    log.info("Stash Sync Complete!")
+    log.info("=" * 60)
+    log.info(f"Time elapsed: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
+    log.info(f"Total scenes in Stash: {total_stats['stash']['scenes_found']}")
+    log.info(f"Scenes with StashDB IDs: {total_stats['stash']['scenes_with_stashdb']}")
+    log.info(f"  ({total_stats['stash']['scenes_found'] - total_stats['stash']['scenes_with_stashdb']} scenes without StashDB IDs were ignored)")
+    log.info(f"Duplicate StashDB IDs skipped: {total_stats['stash']['scenes_duplicate']}")
+    log.info(f"Batches processed: {total_stats['stash']['batches_processed']}")
+    log.info(f"Scenes added to Whisparr: {total_stats['stash']['scenes_added']}")
+    log.info(f"Scenes already existed: {total_stats['stash']['scenes_already_exist']}")
+    log.info(f"Scenes failed: {total_stats['stash']['scenes_failed']}")
+    log.info("=" * 60)
     
     return True
 
 
 # ============== FILE IMPORT FUNCTIONS ==============
 
-def count_files_in_folder(folder: str) -> int:
-    """Count the number of files (not directories) in a folder."""
-    try:
-        items = os.listdir(folder)
-        files = [item for item in items if os.path.isfile(os.path.join(folder, item))]
-        return len(files)
-    except Exception:
-        return 0
-
-
-def get_all_subfolders_recursive(root_path: str, max_depth: int = 10) -> List[tuple]:
-    """Get all subdirectories recursively with their depth and file count."""
+def get_all_subfolders(root_path: str, max_depth: int = 10) -> Tuple[int, List[tuple]]:
+    """Get the root's file count and all subdirectories with their depth and file count."""
+    root_file_count = 0
     all_folders = []
+    stack = [(root_path, 0)]
     
-    def scan_directory(path: str, current_depth: int):
-        if current_depth > max_depth:
-            return
+    log.info("Scanning folder structure and counting files...")
+    while stack:
+        path, depth = stack.pop()
+        file_count = 0
         
+        # One scandir pass per directory; entry types come from the cached dirent
         try:
-            items = os.listdir(path)
-            subfolders = [
-                os.path.join(path, item) 
-                for item in items 
-                if os.path.isdir(os.path.join(path, item))
-            ]
-            
-            for subfolder in subfolders:
-                file_count = count_files_in_folder(subfolder)
-                all_folders.append((subfolder, current_depth, file_count))
-                scan_directory(subfolder, current_depth + 1)
-                
-        except Exception as e:
-            print(f"WARNING: Cannot read directory {path}: {e}")
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        file_count += 1
+                    elif depth < max_depth and entry.is_dir():
+                        stack.append((entry.path, depth + 1))
+        except OSError as e:
+            log.warning(f"WARNING: Cannot read directory {path}: {e}")
+        
+        if depth == 0:
+            root_file_count = file_count
+        else:
+            all_folders.append((path, depth, file_count))
     
-    print("Scanning folder structure and counting files...")
-    scan_directory(root_path, 1)
     all_folders.sort(key=lambda x: (-x[1], -x[2], x[0]))
     
-    return all_folders
+    return root_file_count, all_folders
 
 
 def get_files_to_import(folder: str) -> List[Dict]:
     """Fetch all files from a specific folder that Whisparr can see."""
+    # Runs on prefetch threads, so messages name the folder themselves
     folder_name = os.path.basename(folder) or folder
-    print(f"  Scanning: {folder_name}")
     
     try:
-        response = requests.get(
+        response = whisparr_session.get(
             f"{WHISPARR_URL}/api/v3/manualimport",
-            headers=whisparr_headers,
             params={
                 "folder": folder,
                 "filterExistingFiles": True
@@ -492,44 +835,58 @@ def get_files_to_import(folder: str) -> List[Dict]:
             timeout=120
         )
         response.raise_for_status()
-        return response.json()
+        return decode_json(response)
     except requests.exceptions.Timeout:
-        print(f"  WARNING: Timeout scanning folder (too many files?), skipping...")
+        log.warning(f"  WARNING: Timeout scanning folder {folder_name} (too many files?), skipping...")
         return []
     except requests.exceptions.RequestException as e:
-        print(f"  ERROR: Failed to scan folder: {e}")
+        log.error(f"  ERROR: Failed to scan folder {folder_name}: {e}")
         return []
 
 
+def iter_folder_scans(folders: List[tuple]) -> Iterator[Tuple[tuple, List[Dict]]]:
+    """Yield each folder entry with its scanned files, in order, scanning ahead in the background."""
+    with ThreadPoolExecutor(max_workers=FILE_SCAN_WORKERS) as executor:
+        pending = deque()
+        next_idx = 0
+        
+        for entry in folders:
+            # Only prefetch same-depth folders; a parent must not be scanned before its subfolders import
+            while (next_idx < len(folders) and len(pending) < FILE_SCAN_WORKERS
+                   and folders[next_idx][1] == entry[1]):
+                pending.append(executor.submit(get_files_to_import, folders[next_idx][0]))
+                next_idx += 1
+            
+            yield entry, pending.popleft().result()
+
+
 def filter_matched_files(files: List[Dict]) -> tuple[List[Dict], List[Dict], List[Dict]]:
     """Separate files into matched (importable), potential matches, and unmatched."""
-    matched = []
-    potential = []
-    unmatched = []
+    matched, potential, unmatched = [], [], []
+    add_matched, add_potential, add_unmatched = matched.append, potential.append, unmatched.append
     
     for file in files:
-        rejections = file.get("rejections", [])
         scene = file.get("scene")
         movie = file.get("movie")
         
-        scene_id = None
-        if scene and scene.get("id"):
-            scene_id = scene.get("id")
-        elif movie and movie.get("id"):
-            scene_id = movie.get("id")
+        if (scene and scene.get("id")) or (movie and movie.get("id")):
+            add_matched(file)
+            continue
+        
+        # Rejection reasons are only needed for files that cannot be imported
+        reasons = [r.get("reason", "Unknown") for r in file.get("rejections") or ()]
+        entity = scene or movie
         
-        if scene_id:
-            matched.append(file)
-        elif scene or movie:
-            potential.append({
+        if entity:
+            add_potential({
                 "file": file,
-                "scene_title": (scene or movie).get("title", "Unknown") if (scene or movie) else "Unknown",
-                "rejections": [r.get("reason", "Unknown") for r in rejections]
+                "scene_title": entity.get("title", "Unknown"),
+                "rejections": reasons
             })
         else:
-            unmatched.append({
+            add_unmatched({
                 "path": file.get("path", "Unknown"),
-                "rejections": [r.get("reason", "Unknown") for r in rejections] if rejections else ["No scene/movie data in response"]
+                "rejections": reasons or ["No scene/movie data in response"]
             })
     
     return matched, potential, unmatched
@@ -553,7 +910,7 @@ def import_file_batch(batch: List[Dict]) -> bool:
                 entity_id = movie["id"]
             
             if not entity_id:
-                print(f"    WARNING: Skipping file without valid ID: {file.get('path', 'unknown')}")
+                log.warning(f"    WARNING: Skipping file without valid ID: {file.get('path', 'unknown')}")
                 continue
             
             formatted_file = {
@@ -569,10 +926,10 @@ def import_file_batch(batch: List[Dict]) -> bool:
             formatted_files.append(formatted_file)
         
         if not formatted_files:
-            print(f"    ERROR: No valid files to import in this batch")
+            log.error(f"    ERROR: No valid files to import in this batch")
             return False
         
-        print(f"    Importing {len(formatted_files)} files...")
+        log.info(f"    Importing {len(formatted_files)} files...")
         
         command_data = {
             "name": "ManualImport",
@@ -580,84 +937,79 @@ def import_file_batch(batch: List[Dict]) -> bool:
             "importMode": IMPORT_MODE
         }
         
-        response = requests.post(
+        response = whisparr_session.post(
             f"{WHISPARR_URL}/api/v3/command",
-            headers=whisparr_headers,
-            json=command_data,
+            data=orjson.dumps(command_data),
             timeout=120
         )
         response.raise_for_status()
         
-        result = response.json()
+        result = decode_json(response)
         
         if result.get("id"):
             command_id = result.get("id")
-            print(f"    Import command queued (ID: {command_id})")
+            log.info(f"    Import command queued (ID: {command_id})")
             return True
         else:
-            print(f"    WARNING: Command response missing ID: {result}")
+            log.warning(f"    WARNING: Command response missing ID: {result}")
             return False
             
     except requests.exceptions.RequestException as e:
-        print(f"    ERROR: Failed to import batch: {e}")
+        log.error(f"    ERROR: Failed to import batch: {e}")
         if hasattr(e, 'response') and hasattr(e.response, 'text'):
-            print(f"    Response: {e.response.text}")
+            log.info(f"    Response: {e.response.text}")
         return False
 
 
-def process_file_folder(folder: str, folder_num: int, total_folders: int, depth: int, file_count: int) -> Dict:
-    """Process a single folder and return stats."""
+def process_file_folder(folder: str, folder_num: int, total_folders: int, depth: int, file_count: int,
+                        all_files: List[Dict]) -> Dict:
+    """Process a single scanned folder and return stats."""
     folder_name = os.path.basename(folder) or folder
     indent = "  " * (depth - 1)
-    print(f"\n[{folder_num}/{total_folders}] {indent}Processing (depth {depth}, {file_count} files): {folder_name}")
-    print("-" * 60)
-    
-    all_files = get_files_to_import(folder)
+    log.info(f"\n[{folder_num}/{total_folders}] {indent}Processing (depth {depth}, {file_count} files): {folder_name}")
+    log.info("-" * 60)
     
     if not all_files:
-        print(f"  No files found or accessible")
+        log.info(f"  No files found or accessible")
         return {"imported": 0, "unmatched": 0, "batches": 0}
     
-    print(f"  Found {len(all_files)} files")
+    log.info(f"  Found {len(all_files)} files")
     
     matched, potential, unmatched = filter_matched_files(all_files)
     
-    print(f"  ✓ Matched: {len(matched)} | ? Potential: {len(potential)} | ✗ Unmatched: {len(unmatched)}")
+    log.info(f"  ✓ Matched: {len(matched)} | ? Potential: {len(potential)} | ✗ Unmatched: {len(unmatched)}")
     
     if potential:
-        print(f"  Potential matches (no valid ID, cannot import):")
+        log.info(f"  Potential matches (no valid ID, cannot import):")
         for p in potential[:3]:
-            print(f"    - {os.path.basename(p['file'].get('path', 'unknown'))}")
-            print(f"      Scene: {p['scene_title']}")
+            log.info(f"    - {os.path.basename(p['file'].get('path', 'unknown'))}")
+            log.info(f"      Scene: {p['scene_title']}")
             if p['rejections']:
-                print(f"      Reasons: {', '.join(p['rejections'])}")
+                log.info(f"      Reasons: {', '.join(p['rejections'])}")
         if len(potential) > 3:
-            print(f"    ... and {len(potential) - 3} more")
+            log.info(f"    ... and {len(potential) - 3} more")
     
     if not matched:
-        print(f"  Nothing to import from this folder")
+        log.info(f"  Nothing to import from this folder")
         return {"imported": 0, "unmatched": len(unmatched) + len(potential), "batches": 0}
     
-    print(f"  Importing {len(matched)} files...")
+    log.info(f"  Importing {len(matched)} files...")
     
     total_batches = (len(matched) + FILE_BATCH_SIZE - 1) // FILE_BATCH_SIZE
     successful_batches = 0
     
-    for i in range(0, len(matched), FILE_BATCH_SIZE):
-        batch = matched[i:i+FILE_BATCH_SIZE]
-        batch_num = i // FILE_BATCH_SIZE + 1
-        
+    for batch_num, batch in enumerate(batched(matched, FILE_BATCH_SIZE), 1):
         status = "[DRY RUN]" if DRY_RUN else ""
-        print(f"    Batch {batch_num}/{total_batches} ({len(batch)} files) {status}")
+        log.info(f"    Batch {batch_num}/{total_batches} ({len(batch)} files) {status}")
         
         success = import_file_batch(batch)
         if success:
             successful_batches += 1
         
-        if i + FILE_BATCH_SIZE < len(matched) and FILE_DELAY_BETWEEN_BATCHES > 0:
+        if batch_num < total_batches and FILE_DELAY_BETWEEN_BATCHES > 0:
             time.sleep(FILE_DELAY_BETWEEN_BATCHES)
     
-    print(f"  ✓ Completed: {successful_batches}/{total_batches} batches")
+    log.info(f"  ✓ Completed: {successful_batches}/{total_batches} batches")
     
     return {
         "imported": len(matched),
@@ -668,59 +1020,78 @@ def process_file_folder(folder: str, folder_num: int, total_folders: int, depth:
 
 def run_file_import():
     """Main file import function."""
-    print("\n" + "=" * 60)
-    print("FILE IMPORT MODE")
-    print("=" * 60)
-    print(f"Whisparr URL: {WHISPARR_URL}")
-    print(f"Import Folder: {IMPORT_FOLDER}")
-    print(f"Import Mode: {IMPORT_MODE}")
-    print(f"Batch Size: {FILE_BATCH_SIZE}")
-    print(f"Dry Run: {DRY_RUN}")
-    print(f"Max Depth: {MAX_DEPTH}")
+    log.info("\n" + "=" * 60)
+    log.info("FILE IMPORT MODE")
+    log.info("=" * 60)
+    log.info(f"Whisparr URL: {WHISPARR_URL}")
+    log.info(f"Import Folder: {IMPORT_FOLDER}")
+    log.info(f"Import Mode: {IMPORT_MODE}")
+    log.info(f"Batch Size: {FILE_BATCH_SIZE}")
+    log.info(f"Dry Run: {DRY_RUN}")
+    log.info(f"Max Depth: {MAX_DEPTH}")
     if MAX_SUBFOLDERS:
-        print(f"Max Subfolders: {MAX_SUBFOLDERS}")
-    print("=" * 60)
-    print()
+        log.info(f"Max Subfolders: {MAX_SUBFOLDERS}")
+    log.info("=" * 60)
+    log.info("")
     
     if DRY_RUN:
-        print("⚠️ DRY RUN MODE - No files will be moved/copied\n")
+        log.info("⚠️ DRY RUN MODE - No files will be moved/copied\n")
     
-    if not os.path.exists(IMPORT_FOLDER):
-        print(f"ERROR: Import folder does not exist: {IMPORT_FOLDER}")
+    try:
+        with os.scandir(IMPORT_FOLDER) as entries:
+            has_entries = any(True for _ in entries)
+    except FileNotFoundError:
+        log.error(f"ERROR: Import folder does not exist: {IMPORT_FOLDER}")
+        return False
+    except OSError as e:
+        log.error(f"ERROR: Cannot read import folder {IMPORT_FOLDER}: {e}")
         return False
     
-    print("Discovering subfolders recursively (deepest first, most files first)...")
-    all_subfolders = get_all_subfolders_recursive(IMPORT_FOLDER, MAX_DEPTH)
+    if not has_entries:
+        log.info("Import folder is empty, nothing to import")
+        return True
+    
+    log.info("Discovering subfolders recursively (deepest first, most files first)...")
+    root_file_count, all_subfolders = get_all_subfolders(IMPORT_FOLDER, MAX_DEPTH)
+    
+    # Folders without files of their own have nothing to import, unless they sit
+    # at the depth limit and Whisparr's recursive scan may find deeper files
+    empty_folders = sum(1 for _, depth, file_count in all_subfolders if file_count == 0 and depth < MAX_DEPTH)
+    if empty_folders:
+        log.info(f"Skipping {empty_folders} subfolders without files")
+        all_subfolders = [f for f in all_subfolders if f[2] > 0 or f[1] >= MAX_DEPTH]
     
     if MAX_SUBFOLDERS and len(all_subfolders) > MAX_SUBFOLDERS:
-        print(f"Limiting to first {MAX_SUBFOLDERS} subfolders")
+        log.info(f"Limiting to first {MAX_SUBFOLDERS} subfolders")
         all_subfolders = all_subfolders[:MAX_SUBFOLDERS]
     
     folders_to_process = []
-    if PROCESS_ROOT_FILES:
-        root_file_count = count_files_in_folder(IMPORT_FOLDER)
+    if PROCESS_ROOT_FILES and root_file_count > 0:
         folders_to_process.append((IMPORT_FOLDER, 0, root_file_count))
     folders_to_process.extend(all_subfolders)
     
-    print(f"Found {len(all_subfolders)} subfolders")
+    log.info(f"Found {len(all_subfolders)} subfolders")
     if all_subfolders:
         max_depth = max(depth for _, depth, _ in all_subfolders)
         total_files = sum(file_count for _, _, file_count in all_subfolders)
-        print(f"Maximum folder depth: {max_depth}")
-        print(f"Total files across all folders: {total_files}")
+        log.info(f"Maximum folder depth: {max_depth}")
+        log.info(f"Total files across all folders: {total_files}")
     if PROCESS_ROOT_FILES:
-        print(f"Will also process root folder files")
-    print(f"Total folders to process: {len(folders_to_process)}")
-    print()
+        if root_file_count > 0:
+            log.info(f"Will also process root folder files")
+        else:
+            log.info(f"Root folder has no files, skipping it")
+    log.info(f"Total folders to process: {len(folders_to_process)}")
+    log.info("")
     
     if not folders_to_process:
-        print("No folders to process!")
+        log.info("No folders to process!")
         return True
     
     start_time = time.time()
     
-    for idx, (folder, depth, file_count) in enumerate(folders_to_process, 1):
-        stats = process_file_folder(folder, idx, len(folders_to_process), depth, file_count)
+    for idx, ((folder, depth, file_count), all_files) in enumerate(iter_folder_scans(folders_to_process), 1):
+        stats = process_file_folder(folder, idx, len(folders_to_process), depth, file_count, all_files)
         
         total_stats["files"]["subfolders_processed"] += 1
         total_stats["files"]["files_imported"] += stats["imported"]
@@ -731,15 +1102,15 @@ def run_file_import():
             time.sleep(FILE_DELAY_BETWEEN_SUBFOLDERS)
     
     elapsed = time.time() - start_time
-    print("\n" + "=" * 60)
-    print("File Import Complete!")
-    print("=" * 60)
-    print(f"Time elapsed: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
-    print(f"Subfolders processed: {total_stats['files']['subfolders_processed']}")
-    print(f"Batches processed: {total_stats['files']['batches_processed']}")
-    print(f"Files imported: {total_stats['files']['files_imported']}")
-    print(f"Files left behind (unmatched): {total_stats['files']['files_unmatched']}")
-    print("=" * 60)
+    log.info("\n" + "=" * 60)
+    log.info("File Import Complete!")
+    log.info("=" * 60)
+    log.info(f"Time elapsed: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
+    log.info(f"Subfolders processed: {total_stats['files']['subfolders_processed']}")
+    log.info(f"Batches processed: {total_stats['files']['batches_processed']}")
+    log.info(f"Files imported: {total_stats['files']['files_imported']}")
+    log.info(f"Files left behind (unmatched): {total_stats['files']['files_unmatched']}")
+    log.info("=" * 60)
     
     return True
 
@@ -748,29 +1119,27 @@ def run_file_import():
 
 def run_all_imports():
     """Run the configured import modes."""
-    print("\n" + "=" * 60)
-    print(f"Importarr Starting - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
-    print(f"Mode: {MODE}")
-    print(f"Run Mode: {RUN_MODE}")
+    log.info("\n" + "=" * 60)
+    log.info(f"Importarr Starting - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log.info("=" * 60)
+    log.info(f"Mode: {MODE}")
+    log.info(f"Run Mode: {RUN_MODE}")
     if RUN_MODE == "interval":
-        print(f"Interval: Every {RUN_INTERVAL_HOURS} hours")
-    print("=" * 60)
+        log.info(f"Interval: Every {RUN_INTERVAL_HOURS} hours")
+    log.info("=" * 60)
     
     success = True
     
     if MODE in ["both", "stash"]:
         if not STASH_API_KEY:
-            print("ERROR: STASH_API_KEY not set but stash mode is enabled")
+            log.error("ERROR: STASH_API_KEY not set but stash mode is enabled")
             success = False
         else:
             try:
                 if not run_stash_sync():
                     success = False
             except Exception as e:
-                print(f"ERROR in stash sync: {e}")
-                import traceback
-                traceback.print_exc()
+                log.exception(f"ERROR in stash sync: {e}")
                 success = False
     
     if MODE in ["both", "files"]:
@@ -778,27 +1147,27 @@ def run_all_imports():
             if not run_file_import():
                 success = False
         except Exception as e:
-            print(f"ERROR in file import: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception(f"ERROR in file import: {e}")
             success = False
     
-    print("\n" + "=" * 60)
-    print(f"Importarr Finished - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
+    log.info("\n" + "=" * 60)
+    log.info(f"Importarr Finished - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log.info("=" * 60)
     
     return success
 
 
 def main():
     """Main entry point."""
+    setup_logging()
+    
     if not WHISPARR_API_KEY:
-        print("ERROR: WHISPARR_API_KEY environment variable is required")
+        log.error("ERROR: WHISPARR_API_KEY environment variable is required")
         sys.exit(1)
     
     if MODE not in ["both", "stash", "files"]:
-        print(f"ERROR: Invalid IMPORTARR_MODE: {MODE}")
-        print("Valid options: both, stash, files")
+        log.error(f"ERROR: Invalid IMPORTARR_MODE: {MODE}")
+        log.info("Valid options: both, stash, files")
         sys.exit(1)
     
     if RUN_MODE == "once":
@@ -808,30 +1177,28 @@ def main():
     
     elif RUN_MODE == "interval":
         # Run on schedule
-        print(f"Scheduling import to run every {RUN_INTERVAL_HOURS} hours")
-        print(f"First run will start immediately...")
+        log.info(f"Scheduling import to run every {RUN_INTERVAL_HOURS} hours")
+        log.info(f"First run will start immediately...")
         
         # Run immediately on startup
         run_all_imports()
         
-        # Schedule subsequent runs
-        schedule.every(RUN_INTERVAL_HOURS).hours.do(run_all_imports)
-        
-        print(f"\nNext run scheduled in {RUN_INTERVAL_HOURS} hours")
-        print("Press Ctrl+C to stop")
+        log.info(f"\nNext run scheduled in {RUN_INTERVAL_HOURS} hours")
+        log.info("Press Ctrl+C to stop")
         
-        # Keep running
+        # Sleep through the whole interval instead of polling, then run again
         try:
             while True:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                time.sleep(RUN_INTERVAL_HOURS * 3600)
+                run_all_imports()
+                log.info(f"\nNext run scheduled in {RUN_INTERVAL_HOURS} hours")
         except KeyboardInterrupt:
-            print("\n\nImportarr stopped by user")
+            log.info("\n\nImportarr stopped by user")
             sys.exit(0)
     
     else:
-        print(f"ERROR: Invalid IMPORTARR_RUN_MODE: {RUN_MODE}")
-        print("Valid options: once, interval")
+        log.error(f"ERROR: Invalid IMPORTARR_RUN_MODE: {RUN_MODE}")
+        log.info("Valid options: once, interval")
         sys.exit(1)
 
 
@@ -839,5 +1206,5 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\n\nImportarr cancelled by user")
+        log.info("\n\nImportarr cancelled by user")
         sys.exit(0)